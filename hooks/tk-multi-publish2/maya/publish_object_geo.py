@@ -9,6 +9,7 @@
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
 import os
+import re
 import maya.cmds as cmds
 import maya.mel as mel
 import sgtk
@@ -18,6 +19,16 @@ from sgtk.platform.qt import QtCore, QtGui
 
 HookBaseClass = sgtk.get_hook_baseclass()
 
+# Pipeline steps used to decide the checked state of the publish items
+_MODEL_STEPS = frozenset(
+    {'MODEL', 'TEXTURE_A', 'CLAY_A', 'FOTOGRAMETRY_A', 'GROOM_A', 'MODEL_A', 'SCAN_A'}
+)
+_ANIM_STEPS = frozenset(
+    {'TRACK_3D', 'LAYOUT', 'ANIMATION', 'CLOTH', 'CROWD', 'ANIMATION_A', 'CHARACTER_FX_A',
+     'CLOTH_A', 'LAYOUT_A', 'MODEL_A', 'SCAN_A'}
+)
+_ANIM_SPECIFIC_STEPS = frozenset({'ANIMATION', 'ANIMATION_A'})
+
 
 class MayaObjectGeometryPublishPlugin(HookBaseClass):
     """
@@ -243,6 +254,10 @@ class MayaObjectGeometryPublishPlugin(HookBaseClass):
         publisher = self.parent
         template_name = settings["Publish Template"].value
 
+        # resolve the context once for this item
+        step_name = (publisher.context.step or {}).get('name', '')
+        entity_type = (publisher.context.entity or {}).get('type')
+
         # ============================================================================
         # VALIDATION CHECKS - Early returns for failed validations
         # ============================================================================
@@ -280,7 +295,7 @@ class MayaObjectGeometryPublishPlugin(HookBaseClass):
         item.context_change_allowed = False
 
         # Special case: session geometries on Assets are not accepted
-        if item.type == "maya.session.geometries" and publisher.context.entity['type'] == 'Asset':
+        if item.type == "maya.session.geometries" and entity_type == 'Asset':
             return {"accepted": False, "checked": False}
 
         # ============================================================================
@@ -288,34 +303,28 @@ class MayaObjectGeometryPublishPlugin(HookBaseClass):
         # ============================================================================
 
         if item.type != "maya.session.geometries":
-            cur_selection = cmds.ls(selection=True)
-            cmds.select(item.properties["object"])
-            parentNode = cmds.listRelatives(cmds.ls(selection=True)[0], parent=True, fullPath=True)
-            cmds.select(cur_selection)
+            # query the parent directly, no need to touch the selection
+            obj = item.properties["object"]
+            parentNode = (cmds.listRelatives(obj, parent=True, fullPath=True) or [None])[0]
         else:
             parentNode = _get_root_from_first_mesh()
 
+        # keep the parent node around so publish doesn't have to query it again
+        item.properties["_parent_node"] = parentNode
+
         # ============================================================================
         # DETERMINE CHECKED STATE BASED ON STEP
         # ============================================================================
 
-        step_name = publisher.context.step['name']
-
-        # Define step categories
-        MODELING_STEPS = ['MODEL', 'TEXTURE_A', 'CLAY_A', 'FOTOGRAMETRY_A', 'GROOM_A', 'MODEL_A', 'SCAN_A']
-        ANIMATION_STEPS = ['TRACK_3D', 'LAYOUT', 'ANIMATION', 'CLOTH', 'CROWD', 'ANIMATION_A', 'CHARACTER_FX_A',
-                           'CLOTH_A', 'LAYOUT_A', 'MODEL_A', 'SCAN_A']
-        ANIMATION_SPECIFIC = ['ANIMATION', 'ANIMATION_A']
-
-        if step_name in MODELING_STEPS:
+        if step_name in _MODEL_STEPS:
             # Modeling steps: always checked
             checked = True
 
-        elif step_name in ANIMATION_STEPS:
+        elif step_name in _ANIM_STEPS:
             # Animation-related steps: more complex logic
 
             # For animation-specific steps without animation, don't check
-            if step_name in ANIMATION_SPECIFIC and not _geo_has_animation(parentNode):
+            if step_name in _ANIM_SPECIFIC_STEPS and not self._has_animation(item):
                 checked = False
             # For non-session geometries, check
             elif item.type != "maya.session.geometries":
@@ -342,6 +351,9 @@ class MayaObjectGeometryPublishPlugin(HookBaseClass):
         :returns: True if item is valid, False otherwise.
         """
 
+        # a new publish session starts, forget the task updates of the last one
+        self._get_task_status_updater().start_session()
+
         path = _session_path()
 
         # ---- ensure the session has been saved
@@ -379,10 +391,7 @@ class MayaObjectGeometryPublishPlugin(HookBaseClass):
         # name of the object being exported. get the name stored by the
         # collector and remove any non-alphanumeric characters
 
-        work_fields["maya.object_name"] = item.properties.get("object_name")
-        item.properties["publish_name"] = os.path.basename(str(item.properties.get("path")))[:-9]
-
-
+        work_fields["maya.object_name"] = item.properties["object_name"]
 
         # ensure the fields work for the publish template
         missing_keys = publish_template.missing_keys(work_fields)
@@ -397,11 +406,16 @@ class MayaObjectGeometryPublishPlugin(HookBaseClass):
         # create the publish path by applying the fields. store it in the item's
         # properties. This is the path we'll create and then publish in the base
         # publish plugin. Also set the publish_path to be explicit.
-        work_fields["maya.object_name"] = item.properties["object_name"]
         item.properties["path"] = publish_template.apply_fields(work_fields)
         # item.properties["path"] = item.properties["path"][:-3]+".abc"
         item.properties["publish_path"] = item.properties["path"]
 
+        # name the publish after the alembic file itself, not after whatever
+        # path was on the item before (another plugin's or a previous validate)
+        item.properties["publish_name"] = _publish_name_from_path(
+            item.properties["path"]
+        )
+
         # use the work file's version number when publishing
         if "version" in work_fields:
             item.properties["publish_version"] = work_fields["version"]
@@ -421,11 +435,8 @@ class MayaObjectGeometryPublishPlugin(HookBaseClass):
         """
 
         publisher = self.parent
+        step_name = (publisher.context.step or {}).get('name', '')
 
-
-        # keep track of everything currently selected. we will restore at the
-        # end of the publish method
-        cur_selection = cmds.ls(selection=True)
         # get the path to create and publish
         publish_path = item.properties["path"]
 
@@ -437,42 +448,34 @@ class MayaObjectGeometryPublishPlugin(HookBaseClass):
         # These flags will ensure the export of an Alembic file that contains
         # all visible geometry from the current scene together with UV's and
         # face sets for use in Mari.
+        write_face_sets = settings.get("Write Face Sets").value
+        optional_flags = (
+            (write_face_sets, "-writeFaceSets"),
+            (settings.get("Write Uvs").value, "-uvWrite"),
+            (settings.get("Write Uv Sets").value, "-writeUVSets"),
+            (settings.get("Write Color Sets").value, "-writeColorSets"),
+        )
         alembic_args = [
             # # only renderable objects (visible and not templated)
             "-renderableOnly",
             "-worldSpace",
             "-dataformat",
             "ogawa",
-        ]
-
-        write_face_sets = settings.get("Write Face Sets").value
-        write_uvs = settings.get("Write Uvs").value
-        write_uv_sets = settings.get("Write Uv Sets").value
-        write_color_sets = settings.get("Write Color Sets").value
-        if write_face_sets:
-            alembic_args.append("-writeFaceSets")
-        if write_uvs:
-            alembic_args.append("-uvWrite")
-        if write_uv_sets:
-            alembic_args.append("-writeUVSets")
-        if write_color_sets:
-            alembic_args.append("-writeColorSets")
+        ] + [flag for enabled, flag in optional_flags if enabled]
 
         if item.type != "maya.session.geometries":
             item.properties["publish_type"] = "Alembic Cache"
-            cmds.select(item.properties["object"])
-            if 'TEXTURE' or 'SHADING' in publisher.context.step['name']:
-                bake_facesets_for_selection(remove_object_level_links=True, verbose=True)
-            parentNode = cmds.listRelatives(cmds.ls(selection=True)[0], parent=True, fullPath = True )
-            alembic_args.append("-root")
-            alembic_args.append(cmds.ls(selection=True)[0])
+            root_node = (cmds.ls(item.properties["object"], long=True) or [item.properties["object"]])[0]
+            # baking only matters when the face sets are written to the alembic
+            if write_face_sets and ('TEXTURE' in step_name or 'SHADING' in step_name):
+                bake_facesets_for_nodes([root_node], remove_object_level_links=True, verbose=True)
+            alembic_args += ["-root", root_node]
         else:
             item.properties["publish_type"] = "Session Alembic Cache"
-            parentNode = _get_root_from_first_mesh()
 
-        if _geo_has_animation(parentNode) == True:
+        if self._has_animation(item):
             start_frame, end_frame = _find_scene_animation_range()
-            alembic_args.insert(0, "-frameRange %d %d" % (start_frame-50, end_frame))
+            alembic_args.append("-frameRange %d %d" % (start_frame-50, end_frame))
 
 
 
@@ -497,13 +500,50 @@ class MayaObjectGeometryPublishPlugin(HookBaseClass):
         super(MayaObjectGeometryPublishPlugin, self).publish(settings, item)
 
 
-        # restore selection
-        cmds.select(cur_selection)
-
-        status = {"sg_status_list": "rev"}
-        self.parent.sgtk.shotgun.update("Task", item.context.task['id'], status)
+        # the task status is sent in the background, finalize waits for it
+        self._get_task_status_updater().submit(item.context.task['id'], "rev")
         # self.parent.sgtk.shotgun.update("Shot", item.context.entity['id'], status)
 
+    def finalize(self, settings, item):
+        """
+        Execute the finalization pass. This pass executes once all the publish
+        tasks have completed, and can for example be used to version up files.
+
+        :param settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+        """
+        super(MayaObjectGeometryPublishPlugin, self).finalize(settings, item)
+
+        # make sure the task status updates sent from publish went through
+        self._get_task_status_updater().wait(self.logger)
+
+    def _get_task_status_updater(self):
+        """
+        Return the shared hook sending the Task status updates, see
+        task_status.py.
+        """
+        if getattr(self, "_task_status_updater", None) is None:
+            self._task_status_updater = self.parent.create_hook_instance(
+                "{config}/tk-multi-publish2/maya/task_status.py"
+            )
+        return self._task_status_updater
+
+    def _has_animation(self, item):
+        """
+        Returns True if the item's parent node is animated. The result is
+        stored on the item so the hierarchy is only walked once between
+        accept and publish.
+
+        :param item: Item to process
+        """
+        if "_has_anim" not in item.properties:
+            item.properties["_has_anim"] = _geo_has_animation(
+                item.properties.get("_parent_node")
+            )
+        return item.properties["_has_anim"]
+
 
 def _find_scene_animation_range():
 
@@ -528,33 +568,42 @@ def _find_scene_animation_range():
 
 
 def _geo_has_animation(node):
-    nodos = cmds.listRelatives(node, ad=True, f=True)
-    breakFlag = False
-    if nodos != None:
-        nodos.insert(0, node)
-
-        for i in nodos:
-            if cmds.nodeType(i) == "transform":
-                animAttributes = cmds.listAnimatable(i)
-                if animAttributes != None:
-                    for attribute in animAttributes:
-                        numKeyframes = cmds.keyframe(attribute, query=True, keyframeCount=True)
-                        if numKeyframes > 0:
-                            breakFlag = True
-                            break
-                else:
-                    continue
-
-            elif cmds.nodeType(i) == "mesh":
-                attribute = i + ".inMesh"
-                connections = cmds.listConnections(attribute, d=0)
-                if connections != None:
-                    breakFlag = True
-                    break
-            if breakFlag == True:
-                break
-
-    return breakFlag
+    """
+    Return True if the given node, or anything under it, is animated: either
+    keyed nodes or meshes with an incoming connection on .inMesh.
+    """
+    if not node:
+        return False
+
+    # a single keyframe query over the whole hierarchy, no attribute listing
+    nodos = cmds.listRelatives(node, ad=True, f=True) or []
+    nodos.append(node)
+    if cmds.keyframe(nodos, query=True, keyframeCount=True):
+        return True
+
+    return _has_mesh_input_connections(node)
+
+
+def _has_mesh_input_connections(node):
+    """
+    Return True if any mesh under the given node has an incoming connection
+    on its .inMesh attribute (deformers, caches...).
+    """
+    meshes = cmds.listRelatives(node, ad=True, f=True, type="mesh") or []
+    if not meshes:
+        return False
+    connections = cmds.listConnections([m + ".inMesh" for m in meshes], d=0)
+
+    return bool(connections)
+
+
+def _publish_name_from_path(path):
+    """
+    Return the publish name for the given path: the file name without its
+    extension and trailing version token, e.g. "/a/b/name_v001.abc" -> "name".
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"_v\d+$", "", name)
 
 
 def _session_path():
@@ -599,8 +648,8 @@ def _get_root_from_first_mesh():
     """
     Obtiene todas las mallas, selecciona la primera, y obtiene su nodo raíz.
     """
-    # 1. Obtener todas las geometrías/meshes (shapes)
-    all_meshes = cmds.ls(type='mesh', long=True)
+    # 1. Obtener solo la primera geometría/mesh (shape)
+    all_meshes = cmds.ls(type='mesh', long=True, head=1)
 
     if not all_meshes:
         print("No meshes found in scene")
@@ -610,18 +659,8 @@ def _get_root_from_first_mesh():
     first_mesh = all_meshes[0]
     print("First mesh shape: %s" % first_mesh)
 
-    # 3. Obtener el transform del mesh (el padre del shape)
-    transform = cmds.listRelatives(first_mesh, parent=True, fullPath=True)
-
-    if not transform:
-        print("No transform found for mesh")
-        return None
-
-    first_transform = transform[0]
-    print("Transform node: %s" % first_transform)
-
-    # 4. Obtener el nodo raíz
-    root_node = _get_root_node(first_transform)
+    # 3. Obtener el nodo raíz, el nombre largo ya contiene toda la jerarquía
+    root_node = _get_root_node(first_mesh)
     print("Root node: %s" % root_node)
 
     return root_node
@@ -631,19 +670,12 @@ def _get_root_node(node):
     """
     Obtiene el nodo raíz de cualquier nodo dado.
     """
-    current = node
-
-    while True:
-        parents = cmds.listRelatives(current, parent=True, fullPath=True)
-
-        if not parents:
-            # No hay más padres, este es el root
-            break
-
-        current = parents[0]
+    # El nombre largo es "|root|...|node", el primer elemento es el root
+    full = (cmds.ls(node, long=True) or [node])[0]
+    parts = [p for p in full.split('|') if p]
 
     # Devolver solo el nombre corto (sin path completo)
-    return current.split('|')[-1]
+    return parts[0]
 
 import maya.cmds as cmds
 import maya.mel as mel
@@ -662,35 +694,22 @@ def _get_selected_mesh_shapes():
         cmds.warning("Nothing selected. Select one or more root transforms to process.")
         return []
 
+    # Split the selection by type in Maya rather than one nodeType query per node
+    explicit_meshes = cmds.ls(sel, type="mesh", long=True) or []
+
+    # Expand selection to transforms (if shapes are selected, consider their parents as roots too).
+    # Selected meshes are found again under their parent, so they are not added on their own.
+    roots = set(cmds.ls(sel, type="transform", long=True) or [])
+    if explicit_meshes:
+        roots.update(cmds.listRelatives(explicit_meshes, parent=True, fullPath=True) or [])
+
+    # Get all descendant mesh shapes of every root in one query
     shapes = []
+    if roots:
+        shapes = cmds.listRelatives(list(roots), allDescendents=True, noIntermediate=True, type="mesh", fullPath=True) or []
 
-    # Expand selection to transforms (if shapes are selected, consider their parents as roots too)
-    roots = set()
-    for node in sel:
-        nt = cmds.nodeType(node)
-        if nt == "transform":
-            roots.add(node)
-        elif nt == "mesh":
-            parent = cmds.listRelatives(node, parent=True, fullPath=True) or []
-            if parent:
-                roots.add(parent[0])
-
-    # If user only selected meshes and not transforms, we still include those shapes explicitly
-    explicit_meshes = [n for n in sel if cmds.nodeType(n) == "mesh"]
-    shapes.extend(explicit_meshes)
-
-    # For each root transform, get all descendant mesh shapes
-    for root in roots:
-        desc_meshes = cmds.listRelatives(root, allDescendents=True, noIntermediate=True, type="mesh", fullPath=True) or []
-        shapes.extend(desc_meshes)
-
-    # Deduplicate, preserve order
-    seen = set()
-    out = []
-    for s in shapes:
-        if s not in seen:
-            seen.add(s)
-            out.append(s)
+    # Deduplicate nested roots, preserve order
+    out = list(dict.fromkeys(shapes))
 
     if not out:
         cmds.warning("No mesh shapes found under the selected nodes.")
@@ -735,13 +754,7 @@ def _connected_shading_groups(shape_long):
     """
     sgs = cmds.listConnections(shape_long, type="shadingEngine") or []
     # Deduplicate & keep order
-    seen = set()
-    out = []
-    for sg in sgs:
-        if sg not in seen:
-            seen.add(sg)
-            out.append(sg)
-    return out
+    return list(dict.fromkeys(sgs))
 
 def _members_for_sg(sg):
     """
@@ -771,8 +784,36 @@ def _is_member_object_level_for_shape(member, shape_long):
 
     return False
 
-def _collect_face_assignments_for_shape(shape_long, sgs):
+def _face_components_by_object(members):
     """
+    Partition shadingEngine members into per-face components and the rest.
+    Returns:
+        comp_by_object: dict[long name of the component's object] -> list of components
+        object_members: list of members that are not face components
+    """
+    comp_by_object = {}
+    object_members = []
+    for m in members:
+        dot = m.find(".f[")
+        if dot > 0:
+            comp_by_object.setdefault(m[:dot], []).append(m)
+        else:
+            object_members.append(m)
+
+    # SG members use the shortest unique name, resolve each object once
+    resolved = {}
+    for obj, comps in comp_by_object.items():
+        obj_long = (cmds.ls(obj, long=True) or [obj])[0]
+        resolved.setdefault(obj_long, []).extend(comps)
+
+    return resolved, object_members
+
+def _collect_face_assignments_for_shape(shape_long, sgs, sg_cache=None):
+    """
+    Membership of each SG is partitioned once and stored in 'sg_cache' (if given),
+    so shapes sharing a shading group reuse the same query. The faces assigned
+    while processing one shape never belong to another, so reusing is safe.
+
     Returns:
         assigned_faces_all: set of all face indices already assigned per-face across all SGs
         per_sg_faces: dict[sg] -> set(face indices)
@@ -782,21 +823,24 @@ def _collect_face_assignments_for_shape(shape_long, sgs):
     per_sg_faces = {sg: set() for sg in sgs}
     assigned_faces_all = set()
     object_level_sgs = []
+    xform = _get_shape_transform(shape_long)
 
     for sg in sgs:
-        members = _members_for_sg(sg)
-        if not members:
-            continue
-
-        comp_members = []
-        object_level_here = False
+        if sg_cache is not None and sg in sg_cache:
+            partitioned = sg_cache[sg]
+        else:
+            partitioned = _face_components_by_object(_members_for_sg(sg))
+            if sg_cache is not None:
+                sg_cache[sg] = partitioned
 
-        for m in members:
-            if m.startswith(shape_long + ".f[") or (m.endswith(".f]") and (shape_long.split("|")[-1] + ".f[") in m):
-                comp_members.append(m)
-            else:
-                if _is_member_object_level_for_shape(m, shape_long):
-                    object_level_here = True
+        comp_by_object, object_members = partitioned
+        if not comp_by_object and not object_members:
+            continue
+        # components may be listed under the shape or under its transform
+        comp_members = comp_by_object.get(shape_long, []) + comp_by_object.get(xform, [])
+        object_level_here = any(
+            _is_member_object_level_for_shape(m, shape_long) for m in object_members
+        )
 
         expanded = _expand_face_components(comp_members)
         indices = _parse_face_indices(expanded)
@@ -813,13 +857,29 @@ def _collect_face_assignments_for_shape(shape_long, sgs):
 
     return assigned_faces_all, per_sg_faces, object_level_sgs, face_count
 
+def _face_index_ranges(face_indices):
+    """
+    Collapse face indices into sorted (first, last) runs of consecutive indices,
+    e.g. {0, 1, 2, 5} -> [(0, 2), (5, 5)].
+    """
+    ranges = []
+    for idx in sorted(face_indices):
+        if ranges and idx == ranges[-1][1] + 1:
+            ranges[-1][1] = idx
+        else:
+            ranges.append([idx, idx])
+    return [(a, b) for a, b in ranges]
+
 def _assign_faces_to_sg(shape_long, face_indices, sg):
     """
     Assign the given faces to the shadingEngine (per-face).
     """
     if not face_indices:
         return
-    face_components = ["{}{}.f[{}]".format("", shape_long, idx) for idx in sorted(face_indices)]
+    face_components = [
+        "{}.f[{}]".format(shape_long, a) if a == b else "{}.f[{}:{}]".format(shape_long, a, b)
+        for a, b in _face_index_ranges(face_indices)
+    ]
     try:
         cmds.sets(face_components, edit=True, forceElement=sg)  # crucial call
     except Exception as ex:
@@ -838,7 +898,7 @@ def _remove_object_level_membership(shape_long, sg):
         except Exception:
             pass
 
-def _convert_object_level_materials_to_face_sets(shape_long, remove_object_level_links=True, verbose=True):
+def _convert_object_level_materials_to_face_sets(shape_long, remove_object_level_links=True, verbose=True, sg_cache=None):
     """
     For a given mesh shape:
     - Detect object-level shading group assignments.
@@ -855,7 +915,7 @@ def _convert_object_level_materials_to_face_sets(shape_long, remove_object_level
     if not sgs:
         return
 
-    assigned_faces_all, per_sg_faces, object_level_sgs, face_count = _collect_face_assignments_for_shape(shape_long, sgs)
+    assigned_faces_all, per_sg_faces, object_level_sgs, face_count = _collect_face_assignments_for_shape(shape_long, sgs, sg_cache)
 
     if verbose:
         print("\n[FaceSets] Processing: {}".format(shape_long))
@@ -885,22 +945,49 @@ def _convert_object_level_materials_to_face_sets(shape_long, remove_object_level
     if verbose:
         print("  Conversion done (remaining unassigned faces after pass: {}).".format(len(remaining)))
 
-def bake_facesets_for_selection(remove_object_level_links=True, verbose=True):
+def _bake_facesets_for_shapes(shapes, remove_object_level_links=True, verbose=True):
     """
-    Convert object-level material assignments to per-face for ALL descendant meshes
-    under the currently selected root transform(s).
+    Convert object-level material assignments to per-face for the given mesh shapes.
     """
-    shapes = _get_selected_mesh_shapes()
     if not shapes:
         return []
 
-    for s in shapes:
-        convert_object_level_materials_to_face_sets(
-            s,
-            remove_object_level_links=remove_object_level_links,
-            verbose=verbose
-        )
+    # shading group membership shared across all the shapes
+    sg_cache = {}
+    # a single undo chunk for the whole bake instead of one entry per edit
+    cmds.undoInfo(openChunk=True, chunkName="bake_facesets")
+    try:
+        for s in shapes:
+            _convert_object_level_materials_to_face_sets(
+                s,
+                remove_object_level_links=remove_object_level_links,
+                verbose=verbose,
+                sg_cache=sg_cache
+            )
+    finally:
+        cmds.undoInfo(closeChunk=True)
     if verbose:
         print("\n[FaceSets] Finished. Processed {} mesh shape(s).".format(len(shapes)))
     return shapes
 
+def bake_facesets_for_nodes(roots, remove_object_level_links=True, verbose=True):
+    """
+    Convert object-level material assignments to per-face for ALL descendant meshes
+    under the given root node(s), without relying on the scene selection.
+    """
+    if not roots:
+        return []
+    shapes = cmds.ls(roots, type="mesh", noIntermediate=True, long=True) or []
+    shapes += cmds.listRelatives(roots, allDescendents=True, noIntermediate=True, type="mesh", fullPath=True) or []
+    shapes = list(dict.fromkeys(shapes))
+    if not shapes:
+        cmds.warning("No mesh shapes found under the given nodes.")
+    return _bake_facesets_for_shapes(shapes, remove_object_level_links, verbose)
+
+def bake_facesets_for_selection(remove_object_level_links=True, verbose=True):
+    """
+    Convert object-level material assignments to per-face for ALL descendant meshes
+    under the currently selected root transform(s).
+    """
+    shapes = _get_selected_mesh_shapes()
+    return _bake_facesets_for_shapes(shapes, remove_object_level_links, verbose)
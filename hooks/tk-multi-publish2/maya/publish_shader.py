@@ -9,14 +9,22 @@
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
 import os
+import re
 import maya.cmds as cmds
 import maya.mel as mel
+import maya.OpenMaya as OpenMaya
 import sgtk
 
 from tank_vendor import six
 
 HookBaseClass = sgtk.get_hook_baseclass()
 
+# print the details of the shading groups lookups to the script editor
+_VERBOSE = False
+
+# shape types that can have shading groups assigned
+_SHAPE_TYPES = ['mesh', 'nurbsSurface', 'nurbsCurve']
+
 
 class MayaObjectShaderPublishPlugin(HookBaseClass):
     """
@@ -120,6 +128,13 @@ class MayaObjectShaderPublishPlugin(HookBaseClass):
 
         accepted = True
         publisher = self.parent
+
+        # shading networks are only published from the shading steps, check
+        # that before doing any template or scene work
+        step_name = publisher.context.step['name']
+        if step_name not in ('SHADING_A', 'TEXTURE_A'):
+            return {"accepted": False, "checked": False}
+
         template_name = settings["Publish Template"].value
 
         # ensure a work file template is available on the parent item
@@ -149,14 +164,15 @@ class MayaObjectShaderPublishPlugin(HookBaseClass):
         # natively.
         item.context_change_allowed = False
 
-        obj = item.properties["object"]
-        if len(_get_shading_groups_from_object(obj))==0:
-            accepted = False
+        # no need to walk the object if the templates already rejected it
+        if accepted:
+            obj = item.properties["object"]
+            sgs = _get_shading_groups_from_object(obj)
+            item.properties["shading_groups"] = sgs
+            if not sgs:
+                accepted = False
 
-        if publisher.context.step['name'] in ['SHADING_A', 'TEXTURE_A']:
-            return {"accepted": accepted, "checked": True}
-        else:
-            return {"accepted": False, "checked": False}
+        return {"accepted": accepted, "checked": True}
 
     def validate(self, settings, item):
         """
@@ -170,6 +186,9 @@ class MayaObjectShaderPublishPlugin(HookBaseClass):
         :returns: True if item is valid, False otherwise.
         """
 
+        # a new publish session starts, forget the task updates of the last one
+        self._get_task_status_updater().start_session()
+
         path = _session_path()
 
         # ---- ensure the session has been saved
@@ -185,7 +204,7 @@ class MayaObjectShaderPublishPlugin(HookBaseClass):
         path = sgtk.util.ShotgunPath.normalize(path)
 
         # check that there is still geometry in the scene:
-        if not cmds.ls(geometry=True, noIntermediate=True):
+        if not cmds.ls(geometry=True, noIntermediate=True, head=1):
             error_msg = (
                 "Validation failed because there is no geometry in the scene "
                 "to be exported. You can uncheck this plugin or create "
@@ -208,9 +227,6 @@ class MayaObjectShaderPublishPlugin(HookBaseClass):
         # collector and remove any non-alphanumeric characters
 
         work_fields["maya.object_name"] = item.properties.get("object_name")
-        item.properties["publish_name"] = os.path.basename(str(item.properties.get("path")))[:-9]
-
-
 
         # ensure the fields work for the publish template
         missing_keys = publish_template.missing_keys(work_fields)
@@ -230,6 +246,12 @@ class MayaObjectShaderPublishPlugin(HookBaseClass):
         # item.properties["path"] = item.properties["path"][:-3]+".abc"
         item.properties["publish_path"] = item.properties["path"]
 
+        # name the publish after the shading network file itself, not after
+        # whatever path another plugin left in the item properties
+        item.properties["publish_name"] = _publish_name_from_path(
+            item.properties["path"]
+        )
+
         # use the work file's version number when publishing
         if "version" in work_fields:
             item.properties["publish_version"] = work_fields["version"]
@@ -250,25 +272,33 @@ class MayaObjectShaderPublishPlugin(HookBaseClass):
 
         publisher = self.parent
 
-
-        # keep track of everything currently selected. we will restore at the
-        # end of the publish method
-        cur_selection = cmds.ls(selection=True)
-
-
-
         # get the path to create and publish
         publish_path = item.properties["path"]
 
-        # ensure the publish folder exists:
+        # ensure the publish folder exists, only once per folder as most
+        # shading networks are published to the same one:
         publish_folder = os.path.dirname(publish_path)
-        self.parent.ensure_folder_exists(publish_folder)
+        if not hasattr(self, "_ensured_folders"):
+            self._ensured_folders = set()
+        if publish_folder not in self._ensured_folders:
+            self.parent.ensure_folder_exists(publish_folder)
+            self._ensured_folders.add(publish_folder)
 
         item.properties["publish_type"] = "Maya Shading Network"
         obj = item.properties["object"]
+        # look the shading groups up again, materials may have been assigned
+        # or removed since accept
         shading_groups = _get_shading_groups_from_object(obj)
-        # Select them
-        cmds.select(shading_groups, replace=True)
+        item.properties["shading_groups"] = shading_groups
+
+        # Select them through the API rather than the select command, which
+        # goes through the command engine and the undo queue. Keep track of
+        # everything currently selected to restore it after the export.
+        cur_selection = OpenMaya.MSelectionList()
+        OpenMaya.MGlobal.getActiveSelectionList(cur_selection)
+        OpenMaya.MGlobal.setActiveSelectionList(
+            _get_sets_members_selection(shading_groups), OpenMaya.MGlobal.kReplaceList
+        )
 
         try:
             self.parent.log_debug("Executing shaders export command:" )
@@ -277,17 +307,45 @@ class MayaObjectShaderPublishPlugin(HookBaseClass):
         except Exception as e:
             self.logger.error("Failed to export Shaders: %s" % e)
             return
+        finally:
+            # restore selection
+            OpenMaya.MGlobal.setActiveSelectionList(
+                cur_selection, OpenMaya.MGlobal.kReplaceList
+            )
 
         # Now that the path has been generated, hand it off to the
         super(MayaObjectShaderPublishPlugin, self).publish(settings, item)
 
+        # the task status is sent in the background, finalize waits for it
+        self._get_task_status_updater().submit(item.context.task['id'], "rev")
+        # self.parent.sgtk.shotgun.update("Shot", item.context.entity['id'], status)
 
-        # restore selection
-        cmds.select(cur_selection)
+    def finalize(self, settings, item):
+        """
+        Execute the finalization pass. This pass executes once all the publish
+        tasks have completed, and can for example be used to version up files.
+
+        :param settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+        """
+        super(MayaObjectShaderPublishPlugin, self).finalize(settings, item)
+
+        # make sure the task status updates sent from publish went through
+        self._get_task_status_updater().wait(self.logger)
+
+    def _get_task_status_updater(self):
+        """
+        Return the shared hook sending the Task status updates, see
+        task_status.py.
+        """
+        if getattr(self, "_task_status_updater", None) is None:
+            self._task_status_updater = self.parent.create_hook_instance(
+                "{config}/tk-multi-publish2/maya/task_status.py"
+            )
+        return self._task_status_updater
 
-        status = {"sg_status_list": "rev"}
-        self.parent.sgtk.shotgun.update("Task", item.context.task['id'], status)
-        # self.parent.sgtk.shotgun.update("Shot", item.context.entity['id'], status)
 
 def _find_scene_animation_range():
 
@@ -312,33 +370,44 @@ def _find_scene_animation_range():
 
 
 def _geo_has_animation(node):
-    nodos = cmds.listRelatives(node, ad=True, f=True)
-    breakFlag = False
-    if nodos != None:
-        nodos.insert(0, node)
-
-        for i in nodos:
-            if cmds.nodeType(i) == "transform":
-                animAttributes = cmds.listAnimatable(i)
-                if animAttributes != None:
-                    for attribute in animAttributes:
-                        numKeyframes = cmds.keyframe(attribute, query=True, keyframeCount=True)
-                        if numKeyframes > 0:
-                            breakFlag = True
-                            break
-                else:
-                    continue
-
-            elif cmds.nodeType(i) == "mesh":
-                attribute = i + ".inMesh"
-                connections = cmds.listConnections(attribute, d=0)
-                if connections != None:
-                    breakFlag = True
-                    break
-            if breakFlag == True:
-                break
-
-    return breakFlag
+    """
+    Return True if the given node, or anything under it, is animated: either
+    keyed nodes or meshes with an incoming connection on .inMesh.
+    """
+    if not node:
+        return False
+
+    # a single keyframe query over the whole hierarchy, no attribute listing
+    nodos = cmds.listRelatives(node, ad=True, f=True) or []
+    nodos.append(node)
+    if cmds.keyframe(nodos, query=True, keyframeCount=True):
+        return True
+
+    return _has_mesh_input_connections(node)
+
+
+def _has_mesh_input_connections(node):
+    """
+    Return True if any mesh under the given node has an incoming connection
+    on its .inMesh attribute (deformers, caches...).
+    """
+    meshes = cmds.listRelatives(node, ad=True, f=True, type="mesh") or []
+    if not meshes:
+        return False
+    connections = cmds.listConnections([m + ".inMesh" for m in meshes], d=0)
+
+    return bool(connections)
+
+
+def _publish_name_from_path(path):
+    """
+    Return the publish name for the given path: the file name without its
+    extension and trailing version token, e.g. "/a/b/name_v001.mb" -> "name".
+    Unlike a fixed length slice, this works for any extension length and
+    version padding.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"_v\d+$", "", name)
 
 
 def _session_path():
@@ -387,26 +456,21 @@ def _get_root_from_first_mesh():
     all_meshes = cmds.ls(type='mesh', long=True)
 
     if not all_meshes:
-        print("No meshes found in scene")
         return None
 
     # 2. Obtener el primer mesh
     first_mesh = all_meshes[0]
-    print("First mesh shape: %s" % first_mesh)
 
     # 3. Obtener el transform del mesh (el padre del shape)
     transform = cmds.listRelatives(first_mesh, parent=True, fullPath=True)
 
     if not transform:
-        print("No transform found for mesh")
         return None
 
     first_transform = transform[0]
-    print("Transform node: %s" % first_transform)
 
     # 4. Obtener el nodo raíz
     root_node = _get_root_node(first_transform)
-    print("Root node: %s" % root_node)
 
     return root_node
 
@@ -415,19 +479,33 @@ def _get_root_node(node):
     """
     Obtiene el nodo raíz de cualquier nodo dado.
     """
-    current = node
+    # El nombre largo es "|root|...|node", el índice 0 es la cadena vacía antes del primer "|"
+    full = cmds.ls(node, long=True)[0]
 
-    while True:
-        parents = cmds.listRelatives(current, parent=True, fullPath=True)
+    # Devolver solo el nombre corto (sin path completo)
+    return full.split('|')[1]
 
-        if not parents:
-            # No hay más padres, este es el root
-            break
 
-        current = parents[0]
+def _get_sets_members_selection(sets):
+    """
+    Build a selection list with the members of the given sets, the same
+    selection cmds.select gives when passed a set.
 
-    # Devolver solo el nombre corto (sin path completo)
-    return current.split('|')[-1]
+    :param sets: List of set names
+    :return: MSelectionList with the members of all the sets
+    """
+    members = OpenMaya.MSelectionList()
+    for set_name in sets:
+        set_selection = OpenMaya.MSelectionList()
+        set_selection.add(set_name)
+        set_node = OpenMaya.MObject()
+        set_selection.getDependNode(0, set_node)
+
+        set_members = OpenMaya.MSelectionList()
+        OpenMaya.MFnSet(set_node).getMembers(set_members, False)
+        members.merge(set_members)
+
+    return members
 
 
 def _get_shading_groups_from_object(obj):
@@ -437,34 +515,39 @@ def _get_shading_groups_from_object(obj):
     :param obj: Object name
     :return: List of shading groups
     """
-
-    if not cmds.objExists(obj):
-        print("Object '%s' does not exist" % obj)
+    # a single query resolving both the existence and the type of the object
+    info = cmds.ls(obj, long=True, showType=True) or []
+    if not info:
+        if _VERBOSE:
+            print("Object '%s' does not exist" % obj)
         return []
-
-    shading_groups = set()
-
-    # Get all shapes under this object (including children)
-    shapes = cmds.listRelatives(obj, allDescendents=True, fullPath=True) or []
+    obj_type = info[1]
+
+    # Get all shadeable shapes under this object (including children)
+    # (instances are listed once, history shapes and other types are filtered out by Maya)
+    shapes = list(
+        dict.fromkeys(
+            cmds.listRelatives(
+                obj, allDescendents=True, noIntermediate=True, fullPath=True, type=_SHAPE_TYPES
+            )
+            or []
+        )
+    )
 
     # Also check if the object itself is a shape
-    if cmds.nodeType(obj) in ['mesh', 'nurbsSurface', 'nurbsCurve']:
+    if obj_type in _SHAPE_TYPES:
         shapes.append(obj)
 
-    print("Found %d shapes under '%s'" % (len(shapes), obj))
-
-    # For each shape, find connected shading groups
-    for shape in shapes:
-        # Get shading groups connected to this shape
-        sgs = cmds.listConnections(shape, type='shadingEngine')
-
-        if sgs:
-            shading_groups.update(sgs)
+    # Shape-less hierarchies (locators, empty groups...) have nothing to shade
+    if not shapes:
+        return []
 
-    shading_groups = list(shading_groups)
+    # Get the shading groups connected to all the shapes in a single query
+    shading_groups = list(set(cmds.listConnections(shapes, type='shadingEngine') or []))
 
-    print("\nShading Groups connected to '%s':" % obj)
-    for sg in shading_groups:
-        print("  - %s" % sg)
+    if _VERBOSE:
+        print("\nShading Groups connected to '%s':" % obj)
+        for sg in shading_groups:
+            print("  - %s" % sg)
 
     return shading_groups
\ No newline at end of file
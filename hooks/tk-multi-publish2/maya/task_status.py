@@ -0,0 +1,80 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import concurrent.futures
+import sgtk
+
+HookBaseClass = sgtk.get_hook_baseclass()
+
+
+class TaskStatusUpdater(HookBaseClass):
+    """
+    Sends the Task status updates of the publish plugins in the background,
+    so the publish of the next items doesn't wait for the shotgun server.
+
+    The updates are sent as soon as they are submitted, so the Tasks of the
+    items already published get their status even if a later item fails and
+    finalize never runs.
+    """
+
+    def start_session(self):
+        """
+        Forget the updates of any previous publish session, call it from
+        validate. Updates still running are left to complete.
+        """
+        self._futures = []
+        self._submitted = set()
+
+    def submit(self, task_id, status):
+        """
+        Send a status update for the given task in the background. A task
+        is only updated once per publish session.
+
+        :param task_id: Id of the Task to update
+        :param status: Status code to set on the task
+        """
+        if not hasattr(self, "_futures"):
+            self.start_session()
+        if (task_id, status) in self._submitted:
+            return
+        self._submitted.add((task_id, status))
+
+        if getattr(self, "_pool", None) is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+        # the publisher connection is per thread, the worker gets its own
+        self._futures.append(
+            self._pool.submit(_update_task_status, self.parent, task_id, status)
+        )
+
+    def wait(self, logger):
+        """
+        Wait for the updates of the current session, call it from finalize.
+        Failed updates are logged as warnings, they don't fail the publish.
+
+        :param logger: The logger of the calling plugin
+        """
+        for future in getattr(self, "_futures", []):
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning("Failed to update the Task status: %s" % e)
+        self._futures = []
+
+
+def _update_task_status(bundle, task_id, status):
+    """
+    Update the status of a Task, run from the updater thread.
+
+    :param bundle: The publisher app, its shotgun connection is per thread
+    :param task_id: Id of the Task to update
+    :param status: Status code to set on the task
+    """
+    bundle.shotgun.update("Task", task_id, {"sg_status_list": status})
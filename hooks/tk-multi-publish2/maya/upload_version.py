@@ -9,8 +9,16 @@
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
 import os
+import re
 import glob
 import pprint
+import shutil
+import subprocess
+import tempfile
+import concurrent.futures
+import time
+import collections
+from functools import lru_cache
 import sgtk
 from tank_vendor import six
 import maya.mel as mel
@@ -18,6 +26,20 @@ import maya.cmds as cmds
 
 HookBaseClass = sgtk.get_hook_baseclass()
 
+# frame tokens in sequence paths, any amount of padding
+_HASH_RE = re.compile(r"#+")
+# translation table for forward slashes, ffmpeg wants them on every platform
+_FORWARD_SLASHES = {ord("\\"): "/"}
+
+# ACEScg to Rec709 lut applied to the render dailies
+_LUT_PATH = "L:/NUKE_CONFIG/ACESCg_to_Rec709.cube"
+
+# block size used to read the ffmpeg output
+_FFMPEG_READ_SIZE = 65536
+
+# local copies of the luts, by source path, see _local_lut_path
+_LOCAL_LUTS = {}
+
 
 class UploadVersionPlugin(HookBaseClass):
     """
@@ -30,8 +52,11 @@ class UploadVersionPlugin(HookBaseClass):
         Path to an png icon on disk
         """
 
-        # look for icon one level up from this hook's folder in "icons" folder
-        return os.path.join(self.disk_location, "icons", "review.png")
+        # look for icon one level up from this hook's folder in "icons" folder.
+        # The UI asks for it on every refresh, build the path only once.
+        if getattr(self, "_icon_path", None) is None:
+            self._icon_path = os.path.join(self.disk_location, "icons", "review.png")
+        return self._icon_path
 
     @property
     def name(self):
@@ -47,6 +72,10 @@ class UploadVersionPlugin(HookBaseClass):
         contain simple html for formatting.
         """
 
+        # the UI asks for it on every refresh, build it only once
+        if getattr(self, "_description", None) is not None:
+            return self._description
+
         publisher = self.parent
 
         shotgun_url = publisher.sgtk.shotgun_url
@@ -54,7 +83,7 @@ class UploadVersionPlugin(HookBaseClass):
         media_page_url = "%s/page/media_center" % (shotgun_url,)
         review_url = "https://www.shotgridsoftware.com/features/#review"
 
-        return """
+        self._description = """
         Upload the file to Flow Production Tracking for review.<br><br>
 
         A <b>Version</b> entry will be created in Flow Production Tracking and
@@ -67,6 +96,7 @@ class UploadVersionPlugin(HookBaseClass):
             review_url,
             review_url,
         )
+        return self._description
 
         # TODO: when settings editable, describe upload vs. link
 
@@ -112,6 +142,11 @@ class UploadVersionPlugin(HookBaseClass):
                                "correspond to a template defined in "
                                "templates.yml.",
             },
+            "Max Concurrent Encodes": {
+                "type": "int",
+                "default": 2,
+                "description": "Number of render dailies encoded at the same time",
+            },
             "Dailies Low Template": {
                 "type": "template",
                 "default": None,
@@ -161,17 +196,14 @@ class UploadVersionPlugin(HookBaseClass):
         """
 
         publisher = self.parent
-        item.properties["path"] = _session_path()
+        item.properties["_session_path_cached"] = _session_path()
+        item.properties["path"] = item.properties["_session_path_cached"]
 
         # Accept any files with a valid extension defined in the setting "File Extensions"
-        file_info = publisher.util.get_file_path_components(item.properties["path"])
+        file_info = _get_file_path_components(publisher.util, item.properties["path"])
         extension = file_info["extension"].lower()
 
-        valid_extensions = []
-
-        for ext in settings["File Extensions"].value.split(","):
-            ext = ext.strip().lstrip(".")
-            valid_extensions.append(ext)
+        valid_extensions = self._valid_exts(settings)
 
         self.logger.debug("Valid extensions: %s" % valid_extensions)
 
@@ -205,6 +237,11 @@ class UploadVersionPlugin(HookBaseClass):
         :returns: True if item is valid, False otherwise.
         """
         path = item.properties["path"]
+
+        # the frame rate can't change during the publish, query it once here
+        # for the encode in publish
+        item.properties["_scene_fps"] = _get_scene_fps()
+
         return True
 
     def publish(self, settings, item):
@@ -221,54 +258,34 @@ class UploadVersionPlugin(HookBaseClass):
         path = item.properties["path"]
         uploadPath = item.properties["path"]
 
-        if "sequence_paths" in item.properties.keys() and item.type == "maya.session.render":
+        if "sequence_paths" in item.properties and item.type == "maya.session.render":
 
             path = item.properties['publish_data']['path']
 
             uploadPath = self.get_dailies_path(settings, item)
 
             first = item.properties['sequence_paths'][0][-8:-4]
+            last = item.properties['sequence_paths'][-1][-8:-4]
 
-            framerate = str(mel.eval('float $fps = `currentTimeUnitToFPS`'))
+            framerate = item.properties.get("_scene_fps") or _get_scene_fps()
             start_number = first
-            in_path = path.replace("####", '%04d')
-            in_sequence = in_path.replace('\\', '/')
-            lut_path = r"L\:/NUKE_CONFIG/ACESCg_to_Rec709.cube"  # keep the backslash before the colon
-            out_mov = uploadPath.replace('\\', '/')
+            in_sequence = _to_ffmpeg_path(path)
+            # the lut is read from a local copy, not from the network drive
+            # on every encode, and the colons need a backslash in the filter
+            lut_path = _to_ffmpeg_path(_local_lut_path(_LUT_PATH)).replace(":", "\\:")
 
-            # Build the filter string (double-quoted on the command line; single quotes inside for lut3d path)
+            # Build the filter string (single quotes inside for the lut3d path, ffmpeg's own filter quoting)
             vf = (
                 "format=gbrpf32le,"
                 f"lut3d='{lut_path}',"
                 "scale=1920:1080,format=yuv422p10le"
             )
 
-            # Assemble the final command with all quotes preserved
-            cmd = (
-                f'ffmpeg -framerate {framerate} -start_number {start_number} '
-                f'-i "{in_sequence}" '
-                f'-vf "{vf}" '
-                f'-c:v prores_ks -profile:v 3 -pix_fmt yuv422p10le '
-                f'-movflags +write_colr -color_primaries bt709 -color_trc bt709 -colorspace bt709 '
-                f'"{out_mov}"'
+            # the encode runs alongside the other render items, the upload
+            # waits for it
+            item.properties["_encode_future"] = self._submit_prores_encode(
+                settings, in_sequence, start_number, framerate, uploadPath, vf
             )
-            self.logger.info(cmd)
-            self.logger.info(os.environ['PATH'])
-
-            with subprocess.Popen(
-                    cmd,
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    bufsize=1  # line-buffered
-            ) as proc:
-                for line in proc.stdout:
-                    sys.stdout.write(line)  # stream to your console (or handle it as you like)
-                    self.logger.info(line)
-                return_code = proc.wait()
-
-            print("Exit code:", return_code)
 
         elif item.type == "maya.session":
 
@@ -284,25 +301,21 @@ class UploadVersionPlugin(HookBaseClass):
             # first = cmds.playbackOptions(q=True, min=True)
 
             # Checking Root Structure
-            # rootNodes = cmds.ls(assemblies=True)  # variable con la lista de objetos de la escena
-            rootNodes = cmds.ls(o=True)  # variable con la lista de objetos de la escena
+            rootNodes = cmds.ls(assemblies=True, long=True) or []  # variable con la lista de objetos de la escena
             maxKeyframe = 120
             minKeyframe = 0
-            all_keys = []
 
             '''Se comprueba que solo exista un root null en la escena obviando las camaras'''
 
-            cameras = cmds.listCameras()
-            turntable = True
-            for cam in cameras:
-                if "camMain" in cam:
-                    turntable = False
-                    main = cam
-                else:
-                    try:
-                        rootNodes.remove(cam)
-                    except:
-                        pass
+            # transforms of every camera in the scene, camMain may be inside a group
+            cam_shapes = cmds.ls(type="camera", long=True) or []
+            cameras = set()
+            if cam_shapes:
+                cameras.update(cmds.listRelatives(cam_shapes, parent=True, fullPath=True) or [])
+            main = next((cam for cam in cameras if "camMain" in cam.rsplit("|", 1)[-1]), None)
+            turntable = main is None
+            other_cameras = {cam for cam in cameras if cam != main}
+            rootNodes = [node for node in rootNodes if node not in other_cameras]
             '''Compruebo que la estructura del root es correcta'''
             if len(rootNodes) == 0:
                 error_msg = "Scene structure is incorrect. There is no root nodes."
@@ -311,18 +324,12 @@ class UploadVersionPlugin(HookBaseClass):
 
             else:
 
-                # Check for animations
-                anim = False
-                for node in rootNodes:
-                    all_keys = sorted(cmds.keyframe(node,
-                                                    q=True) or [])  # Get all the keys and sort them by order. We use `or []` in-case it has no keys, which will use an empty list instead so it doesn't crash `sort`.
-                    if len(all_keys) > 0:  # Check to see if it at least has one key.
-                        anim = True
-                        minKeyframe, maxKeyframe = (all_keys[0], all_keys[-1])  # Print the start and end frames
-                        if all_keys[0] < minKeyframe:
-                            minKeyframe = all_keys[0]
-                        if all_keys[-1] > maxKeyframe:
-                            maxKeyframe = all_keys[-1]
+                # Check for animations, the range spans the keys of every root
+                # node and everything below them, in a single query
+                keys = cmds.keyframe(rootNodes, q=True, hierarchy="below") or ()  # `or ()` in-case it has no keys
+                anim = bool(keys)
+                if anim:  # Check to see if it at least has one key.
+                    minKeyframe, maxKeyframe = min(keys), max(keys)
 
                 # rootNode = cmds.listRelatives(rootNodes[0], fullPath=True)
 
@@ -371,23 +378,39 @@ class UploadVersionPlugin(HookBaseClass):
                     last = cmds.playbackOptions(q=True, max=True)
                     cmds.lookThru(main)
 
-                ## Process avi
-                cmds.playblast(format='avi',
-                               filename=uploadPath,
-                               startTime=first,
-                               endTime=last,
-                               widthHeight=[1920, 1080],
-                               sequenceTime=0,
-                               clearCache=1,
-                               viewer=0,
-                               showOrnaments=1,
-                               percent=100,
-                               compression='none',
-                               quality=100,
-                               fo=1)
-
-                if turntable == True:
-                    cmds.delete('rotGrp')
+                ## Process the playblast as png frames, encoded straight to the
+                ## dailies mov so no intermediate movie is ever written
+                frames_dir = tempfile.mkdtemp(prefix="playblast_")
+                try:
+                    cmds.playblast(format='image',
+                                   filename=os.path.join(frames_dir, "frame"),
+                                   startTime=first,
+                                   endTime=last,
+                                   widthHeight=[1920, 1080],
+                                   sequenceTime=0,
+                                   clearCache=1,
+                                   viewer=0,
+                                   showOrnaments=1,
+                                   percent=100,
+                                   compression='png',
+                                   framePadding=4,
+                                   quality=100,
+                                   fo=1)
+
+                    framerate = item.properties.get("_scene_fps") or _get_scene_fps()
+                    in_sequence = _to_ffmpeg_path(os.path.join(frames_dir, "frame.####.png"))
+                    return_code = self._encode_prores(in_sequence, int(first), framerate, uploadPath)
+                finally:
+                    shutil.rmtree(frames_dir, ignore_errors=True)
+
+                    if turntable == True:
+                        cmds.delete('rotGrp')
+
+                # without a movie there is nothing to create a Version for
+                if return_code:
+                    error_msg = "Failed to encode the playblast to %s." % uploadPath
+                    self.logger.error(error_msg)
+                    raise Exception(error_msg)
 
 
         publish_name = item.properties.get("publish_name")
@@ -423,17 +446,20 @@ class UploadVersionPlugin(HookBaseClass):
         if item.type == "maya.session.render":
             version_data["sg_path_to_frames"] = item.properties["publish_path"]
 
-        # log the version data for debugging
-        self.logger.debug(
-            "Populated Version data...",
-            extra={
-                "action_show_more_info": {
-                    "label": "Version Data",
-                    "tooltip": "Show the complete Version data dictionary",
-                    "text": "<pre>%s</pre>" % (pprint.pformat(version_data),),
-                }
-            },
-        )
+        # log the version data for debugging, only format it when debug
+        # logging is on. The sgtk loggers are always at DEBUG level and filter
+        # in their handlers, so the logger level can't tell.
+        if sgtk.LogManager().global_debug:
+            self.logger.debug(
+                "Populated Version data...",
+                extra={
+                    "action_show_more_info": {
+                        "label": "Version Data",
+                        "tooltip": "Show the complete Version data dictionary",
+                        "text": "<pre>%s</pre>" % (pprint.pformat(version_data),),
+                    }
+                },
+            )
 
         # Create the version
         version = publisher.shotgun.create("Version", version_data)
@@ -444,24 +470,12 @@ class UploadVersionPlugin(HookBaseClass):
 
         thumb = item.get_thumbnail_as_path()
 
-        self.logger.info("Uploading content...")
-
-        # on windows, ensure the path is utf-8 encoded to avoid issues with
-        # the shotgun api
-
-        if sgtk.util.is_windows():
-            upload_path = six.ensure_text(uploadPath)
-        else:
-            upload_path = uploadPath
-
-        self.parent.shotgun.upload(
-            "Version", version["id"], upload_path, "sg_uploaded_movie"
+        # upload while the next items are processed, render movies are
+        # uploaded as soon as their encode is done
+        item.properties["_upload_future"] = self._submit_upload(
+            version, uploadPath, item.properties.get("_encode_future")
         )
 
-        self.logger.info("Upload complete!")
-
-
-
     def finalize(self, settings, item):
         """
         Execute the finalization pass. This pass executes once all the publish
@@ -476,6 +490,30 @@ class UploadVersionPlugin(HookBaseClass):
         path = item.properties["path"]
         version = item.properties["sg_version_data"]
 
+        # wait for the background encode and upload of this item
+        encode_future = item.properties.get("_encode_future")
+        if encode_future is not None:
+            try:
+                return_code, tail = encode_future.result()
+            except FileNotFoundError:
+                self._raise_ffmpeg_not_found()
+            self._log_ffmpeg_result(return_code, tail)
+            if return_code:
+                error_msg = (
+                    "Failed to encode the render movie, the Version %s has no movie."
+                    % (version["id"],)
+                )
+                self.logger.error(error_msg)
+                raise Exception(error_msg)
+
+        upload_future = item.properties.get("_upload_future")
+        if upload_future is not None:
+            if not upload_future.result():
+                error_msg = "The movie of the Version %s was not uploaded." % (version["id"],)
+                self.logger.error(error_msg)
+                raise Exception(error_msg)
+            self.logger.info("Upload complete!")
+
         self.logger.info(
             "Version uploaded for file: %s" % (path,),
             extra={
@@ -487,6 +525,182 @@ class UploadVersionPlugin(HookBaseClass):
             },
         )
 
+    def _encode_prores(self, in_sequence, start_number, framerate, out_mov, vf=None):
+        """
+        Encode an image sequence to a ProRes 422 HQ quicktime with ffmpeg.
+
+        :param in_sequence: Path to the frames, with a printf style frame token (%04d)
+        :param start_number: First frame of the sequence
+        :param framerate: Frame rate of the sequence
+        :param out_mov: Path to the quicktime to write
+        :param vf: Optional ffmpeg video filter string
+        :return: The ffmpeg return code
+        """
+        cmd = self._get_prores_cmd(in_sequence, start_number, framerate, out_mov, vf)
+        try:
+            return_code, tail = _run_ffmpeg(cmd, progress_callback=self.logger.debug)
+        except FileNotFoundError:
+            self._raise_ffmpeg_not_found()
+        self._log_ffmpeg_result(return_code, tail)
+        return return_code
+
+    def _raise_ffmpeg_not_found(self):
+        """
+        Report that the ffmpeg executable could not be started.
+        """
+        error_msg = (
+            "ffmpeg could not be found. Make sure it is installed and that "
+            "its folder is in the PATH: %s" % os.environ.get("PATH", "")
+        )
+        self.logger.error(error_msg)
+        raise Exception(error_msg)
+
+    def _submit_prores_encode(self, settings, in_sequence, start_number, framerate, out_mov, vf=None):
+        """
+        Same as _encode_prores, but the encode runs in the background alongside
+        the other items' encodes. The returned future gives the ffmpeg return
+        code and output tail, see _run_ffmpeg.
+
+        :param settings: Dictionary of Settings, used for "Max Concurrent Encodes".
+        """
+        cmd = self._get_prores_cmd(in_sequence, start_number, framerate, out_mov, vf)
+
+        # rebuild the pool when the setting changed since it was created, the
+        # encodes already queued on the old one still run to completion
+        max_workers = max(1, settings["Max Concurrent Encodes"].value)
+        if getattr(self, "_encode_pool_size", None) != max_workers:
+            old_pool = getattr(self, "_encode_pool", None)
+            if old_pool is not None:
+                old_pool.shutdown(wait=False)
+            self._encode_pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+            self._encode_pool_size = max_workers
+
+        # the workers don't log: the publisher log isn't safe to use outside
+        # the main thread, results are reported when the future is resolved
+        return self._encode_pool.submit(_run_ffmpeg, cmd)
+
+    def _get_prores_cmd(self, in_sequence, start_number, framerate, out_mov, vf=None):
+        """
+        Build the ffmpeg command encoding an image sequence to ProRes 422 HQ.
+        See _encode_prores for the parameters.
+        """
+        # ffmpeg doesn't create missing output folders
+        self.parent.ensure_folder_exists(os.path.dirname(out_mov))
+        out_mov = _to_ffmpeg_path(out_mov)
+
+        # let ffmpeg use every core for the lut/scale filters and the encode,
+        # and queue enough input frames so the image reads don't stall them
+        threads = os.cpu_count() or 1
+        self.logger.debug("Encoding with %d filter threads" % threads)
+
+        # the arguments are passed to ffmpeg as they are, without a shell in
+        # between, so paths and the filter string need no extra quoting
+        cmd = [
+            "ffmpeg",
+            # overwrite the movie of a previous publish of the same version,
+            # stdin is closed so ffmpeg can't ask
+            "-y",
+            "-filter_threads", str(threads),
+            "-filter_complex_threads", str(threads),
+            "-thread_queue_size", "1024",
+            "-framerate", str(framerate),
+            "-start_number", str(start_number),
+            "-i", in_sequence,
+        ]
+        if vf:
+            cmd += ["-vf", vf]
+        cmd += [
+            "-threads", "0",
+            "-c:v", "prores_ks", "-profile:v", "3", "-pix_fmt", "yuv422p10le",
+            "-movflags", "+write_colr",
+            "-color_primaries", "bt709", "-color_trc", "bt709", "-colorspace", "bt709",
+            out_mov,
+        ]
+        if sgtk.LogManager().global_debug:
+            self.logger.debug(subprocess.list2cmdline(cmd))
+            self.logger.debug(os.environ['PATH'])
+
+        return cmd
+
+    def _log_ffmpeg_result(self, return_code, tail):
+        """
+        Report a failed ffmpeg run, with the tail of its output.
+
+        :param return_code: The ffmpeg return code
+        :param tail: The last lines of the ffmpeg output
+        """
+        if return_code:
+            self.logger.error(
+                "ffmpeg failed with exit code %s" % return_code,
+                extra={
+                    "action_show_more_info": {
+                        "label": "Show Output",
+                        "tooltip": "Show the last lines of the ffmpeg output",
+                        "text": "<pre>%s</pre>" % "".join(tail),
+                    }
+                },
+            )
+
+    def _submit_upload(self, version, upload_path, encode_future=None):
+        """
+        Upload the given movie to the Version in the background, so the next
+        items can be processed meanwhile. finalize waits for the upload.
+
+        :param version: The Version entity dictionary
+        :param upload_path: Path to the movie to upload
+        :param encode_future: Optional future of the encode writing the movie,
+            the upload waits for it and is skipped if the encode failed
+        :return: A future resolving to True once the movie has been uploaded
+        """
+        self.logger.info("Uploading content...")
+
+        # on windows, ensure the path is utf-8 encoded to avoid issues with
+        # the shotgun api
+
+        if sgtk.util.is_windows():
+            upload_path = six.ensure_text(upload_path)
+
+        if getattr(self, "_upload_pool", None) is None:
+            self._upload_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+        return self._upload_pool.submit(
+            _upload_movie, self.parent, version["id"], upload_path, encode_future
+        )
+
+    def _valid_exts(self, settings):
+        """
+        Return the set of extensions listed in the "File Extensions" setting,
+        lowercase and without leading dots. The result is cached on the
+        plugin keyed by the raw setting value.
+
+        :param settings: This plugin instance's configured settings
+        """
+        raw = settings["File Extensions"].value
+        cache = self.__dict__.setdefault("_ext_cache", {})
+        exts = cache.get(raw)
+        if exts is None:
+            exts = frozenset(e.strip().lstrip(".").lower() for e in raw.split(","))
+            cache[raw] = exts
+        return exts
+
+    def _ext_to_type(self, settings):
+        """
+        Return a dictionary mapping each extension of the "File Types" setting
+        to its publish type, the first type listing an extension wins. The
+        result is cached on the plugin for the current setting value.
+
+        :param settings: This plugin instance's configured settings
+        """
+        file_types = settings["File Types"].value
+        cached = getattr(self, "_ext_to_type_cache", None)
+        if cached is None or cached[0] is not file_types:
+            ext_map = {}
+            for type_def in file_types:
+                for ext in type_def[1:]:
+                    ext_map.setdefault(ext, type_def[0])
+            cached = self._ext_to_type_cache = (file_types, ext_map)
+        return cached[1]
+
     def _get_version_entity(self, item):
         """
         Returns the best entity to link the version to.
@@ -516,7 +730,7 @@ class UploadVersionPlugin(HookBaseClass):
             raise AttributeError("'PublishData' object has no attribute 'path'")
 
         # get the publish path components
-        path_info = publisher.util.get_file_path_components(path)
+        path_info = _get_file_path_components(publisher.util, path)
 
         # determine the publish type
         extension = path_info["extension"]
@@ -525,14 +739,10 @@ class UploadVersionPlugin(HookBaseClass):
         if extension:
             extension = extension.lstrip(".").lower()
 
-            for type_def in settings["File Types"].value:
-
-                publish_type = type_def[0]
-                file_extensions = type_def[1:]
-
-                if extension in file_extensions:
-                    # found a matching type in settings. use it!
-                    return publish_type
+            publish_type = self._ext_to_type(settings).get(extension)
+            if publish_type:
+                # found a matching type in settings. use it!
+                return publish_type
 
         # --- no pre-defined publish type found...
 
@@ -561,12 +771,19 @@ class UploadVersionPlugin(HookBaseClass):
             template_name = settings["Dailies Low Template"].value
         elif item.type == "maya.session.render":
             template_name = settings["Dailies Template"].value
-        dailies_template = publisher.get_template_by_name(template_name)
+        else:
+            template_name = None
+
+        # templates are looked up once per name
+        if not hasattr(self, "_dailies_templates"):
+            self._dailies_templates = {}
+        if template_name not in self._dailies_templates:
+            self._dailies_templates[template_name] = (
+                publisher.get_template_by_name(template_name) if template_name else None
+            )
+        dailies_template = self._dailies_templates[template_name]
         item.properties["dailies_template"] = dailies_template
 
-
-
-
         return dailies_template
 
 
@@ -586,52 +803,186 @@ class UploadVersionPlugin(HookBaseClass):
 
 
 
-        # fall back to template/path logic
-        path = _session_path()
         if item.type == "maya.session":
             work_template = item.properties.get("work_template")
         elif item.type == "maya.session.render":
             work_template = item.parent.properties.get("work_template")
+        else:
+            work_template = None
         dailies_template = self.get_dailies_template(settings, item)
 
+        # We need both work and publish template to be defined for template
+        # support to be enabled, don't touch the path otherwise.
+        if not (work_template and dailies_template):
+            self.logger.debug("dailies_template: %s" % dailies_template)
+            self.logger.debug("work_template: %s" % work_template)
+            return None
 
+        # fall back to template/path logic
+        path = item.properties.get("_session_path_cached") or _session_path()
+
+        # get_fields matches the path against the template, and raises if it
+        # doesn't match, so there is no need to validate it first
+        try:
+            work_fields = work_template.get_fields(path)
+        except sgtk.TankError:
+            work_fields = {}
+        else:
+            if item.type == "maya.session.render":
+                work_fields["maya.layer_name"] = item.properties["maya.layer_name"]
+            work_fields["extension"] = "mov"
 
-        work_fields = []
         dailies_path = None
+        missing_keys = dailies_template.missing_keys(work_fields)
 
-        # We need both work and publish template to be defined for template
-        # support to be enabled.
-        if work_template and dailies_template:
+        if missing_keys:
+            self.logger.warning(
+                "Not enough keys to apply work fields (%s) to "
+                "publish template (%s)" % (work_fields, dailies_template)
+            )
+        else:
+            dailies_path = dailies_template.apply_fields(work_fields)
+            self.logger.debug(
+                "Used publish template to determine the publish path: %s"
+                % (dailies_path,)
+            )
 
-            if work_template.validate(path):
-                work_fields = work_template.get_fields(path)
-                if item.type == "maya.session":
-                    work_fields["extension"] = "avi"
-                elif item.type == "maya.session.render":
-                    work_fields["maya.layer_name"] = item.properties["maya.layer_name"]
-                    work_fields["extension"] = "mov"
+        return dailies_path
 
+def _upload_movie(bundle, version_id, upload_path, encode_future=None):
+    """
+    Upload a movie to a Version, run from the upload thread pool.
 
-            missing_keys = dailies_template.missing_keys(work_fields)
+    :param bundle: The publisher app, its shotgun connection is per thread
+    :param version_id: Id of the Version to upload to
+    :param upload_path: Path to the movie to upload
+    :param encode_future: Optional future of the encode writing the movie
+    :return: True if the movie was uploaded, False if its encode failed
+    """
+    if encode_future is not None and encode_future.result()[0] != 0:
+        return False
 
+    bundle.shotgun.upload("Version", version_id, upload_path, "sg_uploaded_movie")
+    return True
 
-            if missing_keys:
-                self.logger.warning(
-                    "Not enough keys to apply work fields (%s) to "
-                    "publish template (%s)" % (work_fields, dailies_template)
-                )
-            else:
-                dailies_path = dailies_template.apply_fields(work_fields)
-                self.logger.debug(
-                    "Used publish template to determine the publish path: %s"
-                    % (dailies_path,)
+
+def _to_ffmpeg_path(path):
+    """
+    Return the given path as ffmpeg expects it: forward slashes and printf
+    style frame tokens, e.g. "C:\\renders\\beauty.####.exr" ->
+    "C:/renders/beauty.%04d.exr".
+
+    :param path: Path to convert
+    """
+    path = _HASH_RE.sub(lambda m: "%%0%dd" % len(m.group(0)), path)
+    return path.translate(_FORWARD_SLASHES)
+
+
+def _local_lut_path(path):
+    """
+    Return a local copy of the given lut, so the encodes of a session don't
+    read it from the network drive every time. The copy is checked against
+    the source once per Maya session. Falls back to the source path if it
+    can't be copied, the copy is tried again on the next call.
+
+    :param path: Path to the lut
+    """
+    local_path = _LOCAL_LUTS.get(path)
+    if local_path:
+        return local_path
+
+    local_path = os.path.join(tempfile.gettempdir(), "sgtk_dailies_luts", os.path.basename(path))
+    try:
+        src_stat = os.stat(path)
+        try:
+            local_stat = os.stat(local_path)
+            up_to_date = (
+                local_stat.st_size == src_stat.st_size
+                and local_stat.st_mtime >= src_stat.st_mtime
+            )
+        except OSError:
+            up_to_date = False
+        if not up_to_date:
+            # copy next to the destination and move it in place, so an encode
+            # from another Maya session never reads a half written lut
+            local_dir = os.path.dirname(local_path)
+            os.makedirs(local_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=local_dir, suffix=".tmp")
+            os.close(fd)
+            try:
+                shutil.copy2(path, tmp_path)
+                os.replace(tmp_path, local_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+    except (OSError, shutil.Error):
+        return path
+
+    _LOCAL_LUTS[path] = local_path
+    return local_path
+
+
+def _run_ffmpeg(cmd, progress_callback=None):
+    """
+    Run an ffmpeg command until it completes.
+
+    :param cmd: The ffmpeg arguments list
+    :param progress_callback: Optional callable receiving progress or error
+        lines, at most once per second
+    :return: Tuple with the return code and the last lines of the output
+    """
+    with subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=_FFMPEG_READ_SIZE,
+    ) as proc:
+        # read the output in large blocks and only keep its tail for error
+        # reporting, it is decoded once the encode is over
+        chunks = collections.deque(maxlen=16)
+        last_log = time.monotonic()
+        while True:
+            chunk = proc.stdout.read1(_FFMPEG_READ_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if progress_callback is None:
+                continue
+            now = time.monotonic()
+            if now - last_log >= 1.0:
+                # ffmpeg ends its progress lines with \r
+                lines = chunk.decode("utf-8", "replace").replace("\r", "\n").split("\n")
+                line = next(
+                    (l for l in reversed(lines) if "frame=" in l or "error" in l.lower()), None
                 )
-        else:
-            self.logger.debug("dailies_template: %s" % dailies_template)
-            self.logger.debug("work_template: %s" % work_template)
+                if line:
+                    progress_callback(line.strip())
+                    last_log = now
+        return_code = proc.wait()
 
+    output = b"".join(chunks).decode("utf-8", "replace")
+    return return_code, output.splitlines(True)[-200:]
+
+
+@lru_cache(maxsize=512)
+def _get_file_path_components(util, path):
+    """
+    Cached version of the publisher util get_file_path_components. Callers
+    must not modify the returned dictionary.
+
+    :param util: The publisher util module
+    :param path: The path to split
+    """
+    return util.get_file_path_components(path)
+
+
+def _get_scene_fps():
+    """
+    Return the frame rate of the current scene as a string.
+    """
+    return str(mel.eval('float $fps = `currentTimeUnitToFPS`'))
 
-        return dailies_path
 
 def _session_path():
     """